@@ -1,120 +1,30 @@
-import pandas as pd
-import random
-import difflib
-from datetime import datetime, timedelta
-import json
+import hmac
 import os
-from flask import Flask, request, redirect, url_for, session, flash, get_flashed_messages
+from datetime import datetime, timedelta, date
+from srs_engine import (SpacedRepetitionSystem, normalize_text, EXCEL_PATH, PROGRESS_PATH,
+                        CONFUSIONS_PATH, ROLLUPS_PATH, BASE_DIR)
+from profiling import RequestProfiler, list_profiles, format_profile, process_memory
+from flask import Flask, request, redirect, url_for, session, flash, get_flashed_messages, jsonify, send_file
 from jinja2 import Environment, DictLoader
 
-# Configura las rutas base
-BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-EXCEL_PATH = os.path.join(BASE_DIR, 'vocabulary_norwegian.xlsx')
-PROGRESS_PATH = os.path.join(BASE_DIR, 'progress.json')
-
-# ---------------------------
-# Clases del Sistema SRS
-# ---------------------------
-class VocabularyCard:
-    def __init__(self, data):
-        # Manejar artículos vacíos y valores NaN
-        article = str(data['Article']).strip() if pd.notna(data['Article']) else ""
-        self.norwegian = f"{article} {data['Norwegian']}".strip() if article else data['Norwegian']
-        self.english = data['English']  # Puede contener varias traducciones separadas por comas
-        self.due_date = datetime.now()
-        self.interval = 1
-        self.ease = 2.5
-        self.reps = 0
-        self.fail_count = 0  # Contador de fallos
-        self.id = None  # Se asignará un ID único en load_data
-
-    def update(self, quality):
-        if quality < 3:
-            self.interval = 1
-            self.reps = 0
-            self.fail_count += 1  # Incrementa el contador de fallos si la respuesta es mala
-        else:
-            self.interval = (self.interval * self.ease) + 0.1
-            self.reps += 1
-        
-        self.ease = max(1.3, self.ease + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)))
-        self.due_date = datetime.now() + timedelta(days=int(self.interval))
-
-class SpacedRepetitionSystem:
-    def __init__(self, filename):
-        self.cards = []
-        self.progress_file = PROGRESS_PATH
-        self.load_data(filename)
-        # Asegúrate de que progress.json existe
-        if not os.path.exists(self.progress_file):
-            self.save_progress()  # Crea el archivo si no existe
-        self.load_progress()
-    
-    def load_data(self, filename):
-        df = pd.read_excel(filename, sheet_name='Sheet1')
-        # Convertir NaN a strings vacíos y asegurar tipo string
-        df['Article'] = df['Article'].fillna('').astype(str)
-        
-        for idx, (_, row) in enumerate(df.iterrows()):
-            if pd.notna(row['Norwegian']) and pd.notna(row['English']):
-                card = VocabularyCard({
-                    'Article': row['Article'].strip(),
-                    'Norwegian': row['Norwegian'],
-                    'English': row['English']
-                })
-                card.id = idx  # Asignar un ID único
-                self.cards.append(card)
-    
-    def load_progress(self):
-        if os.path.exists(self.progress_file):
-            with open(self.progress_file, 'r') as f:
-                progress = json.load(f)
-                for card, data in zip(self.cards, progress):
-                    card.__dict__.update(data)
-                    card.due_date = datetime.fromisoformat(data['due_date'])
-    
-    def save_progress(self):
-        progress = []
-        for card in self.cards:
-            card_data = card.__dict__.copy()
-            card_data['due_date'] = card.due_date.isoformat()
-            progress.append(card_data)
-        
-        with open(self.progress_file, 'w') as f:
-            json.dump(progress, f)
-    
-    def get_due_cards(self):
-        print(f"Total cards loaded: {len(self.cards)}")
-        due_cards = [card for card in self.cards if datetime.now() > card.due_date]
-        print(f"Due cards: {len(due_cards)}")
-        return due_cards
-    
-    def get_card_by_id(self, card_id):
-        for card in self.cards:
-            if card.id == card_id:
-                return card
-        return None
-
-# ---------------------------
-# Función para obtener diferencias
-# ---------------------------
-def get_diff(correct, user):
-    """Genera un resumen de las diferencias entre la respuesta correcta y la del usuario."""
-    sm = difflib.SequenceMatcher(None, correct, user)
-    differences = []
-    for tag, i1, i2, j1, j2 in sm.get_opcodes():
-        if tag != 'equal':
-            differences.append(f"{tag}: '{correct[i1:i2]}' vs '{user[j1:j2]}'")
-    return "; ".join(differences)
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(BASE_DIR, 'profiles'))
+# Estrategia para elegir la siguiente tarjeta: "weighted" (retraso y fallos) o "uniform"
+SELECTION_STRATEGY = os.environ.get("SELECTION_STRATEGY", "weighted")
 
 # ---------------------------
 # Configuración de Flask y Jinja2
 # ---------------------------
 app = Flask(__name__)
 app.secret_key = "tu_clave_secreta_aqui"  # Necesaria para manejar la sesión
+# Token para las rutas /admin (solo en la cabecera X-Admin-Token); si no está
+# definido, quedan desactivadas. ADMIN_READ_TOKEN da acceso solo a las páginas
+# de consulta (perfiles, memoria) y también se acepta como `?token=`
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+ADMIN_READ_TOKEN = os.environ.get("ADMIN_READ_TOKEN")
 
 # Modifica la inicialización
-srs = SpacedRepetitionSystem(EXCEL_PATH)
+srs = SpacedRepetitionSystem(EXCEL_PATH, progress_file=PROGRESS_PATH, confusions_file=CONFUSIONS_PATH,
+                             strategy=SELECTION_STRATEGY, rollups_file=ROLLUPS_PATH)
 
 # ---------------------------
 # Templates (almacenados en un diccionario)
@@ -759,6 +669,297 @@ templates = {
       {% endif %}
     {% endif %}
   {% endwith %}
+  <p style="text-align: center;">
+    <a href="{{ url_for('offline') }}" style="color: #666;">Modo sin conexión</a>
+  </p>
+{% endblock %}
+""",
+    "offline": """
+{% extends "base" %}
+{% block content %}
+  <div class="stats-header">
+    <button onclick="window.location.href='{{ url_for('index') }}'" class="back-button">
+      ← Volver
+    </button>
+    <h1>Modo sin conexión</h1>
+  </div>
+  <p id="sync-status" style="color: #666;">Cargando vocabulario...</p>
+
+  <div class="card" id="review-card" style="display: none">
+    <h2>Palabra en Noruego:</h2>
+    <h1 id="review-word"></h1>
+    <form id="review-form" autocomplete="off">
+      <label for="review-answer">Traducción al inglés:</label>
+      <input type="text" id="review-answer" required placeholder="Escribe la traducción..." autocapitalize="off">
+      <button type="submit">Verificar</button>
+    </form>
+  </div>
+
+  <div class="card feedback-card" id="review-feedback" style="display: none">
+    <div class="feedback-content" id="review-message"></div>
+    <button id="review-next" class="next-button">Siguiente palabra →</button>
+  </div>
+
+  <div class="card no-cards" id="review-empty" style="display: none">
+    <h2>¡No hay tarjetas pendientes por ahora!</h2>
+    <p style="color: #666;">Vuelve más tarde para continuar practicando.</p>
+  </div>
+
+  <script>
+    // El mazo y la cola de respuestas viven en localStorage; el servidor solo
+    // se consulta para recibir cambios (GET /sync?since=) y subir la cola.
+    const DECK_KEY = 'srs-deck';
+    const QUEUE_KEY = 'srs-queue';
+    let deck = JSON.parse(localStorage.getItem(DECK_KEY) || '{"version": 0, "deck": null, "cards": {}}');
+    let queue = JSON.parse(localStorage.getItem(QUEUE_KEY) || '[]');
+    let current = null;
+
+    function persist() {
+      localStorage.setItem(DECK_KEY, JSON.stringify(deck));
+      localStorage.setItem(QUEUE_KEY, JSON.stringify(queue));
+    }
+
+    function applyFeed(feed) {
+      if (feed.full) {
+        deck = {version: feed.version, deck: feed.deck, cards: {}};
+      }
+      feed.cards.forEach(card => {
+        deck.cards[card.id] = Object.assign(deck.cards[card.id] || {}, card);
+      });
+      deck.version = feed.version;
+      deck.deck = feed.deck;
+      persist();
+    }
+
+    async function sync() {
+      const status = document.getElementById('sync-status');
+      const sent = queue.slice();
+      try {
+        let response;
+        if (sent.length) {
+          response = await fetch('{{ url_for('sync') }}', {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({since: deck.version, deck: deck.deck, answers: sent})
+          });
+        } else {
+          response = await fetch('{{ url_for('sync') }}?since=' + deck.version + '&deck=' + (deck.deck || ''));
+        }
+        if (!response.ok) throw new Error(response.status);
+        const feed = await response.json();
+        queue = queue.slice(sent.length);
+        applyFeed(feed);
+        status.textContent = 'Sincronizado (' + Object.keys(deck.cards).length + ' palabras)';
+      } catch (e) {
+        status.textContent = 'Sin conexión: ' + queue.length + ' respuestas pendientes de sincronizar';
+      }
+    }
+
+    function normalize(text) {
+      return text.toLowerCase().split(/\\s+/).filter(Boolean).join(' ');
+    }
+
+    function similarity(a, b) {
+      // Ratio basado en la distancia de Levenshtein (aproxima difflib en el servidor)
+      if (!a.length && !b.length) return 1;
+      let prev = Array.from({length: b.length + 1}, (_, j) => j);
+      for (let i = 1; i <= a.length; i++) {
+        const row = [i];
+        for (let j = 1; j <= b.length; j++) {
+          row[j] = Math.min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + (a[i - 1] === b[j - 1] ? 0 : 1));
+        }
+        prev = row;
+      }
+      return 1 - prev[b.length] / Math.max(a.length, b.length);
+    }
+
+    function grade(card, answer) {
+      const alternatives = card.english.split(',').map(normalize);
+      if (alternatives.includes(answer)) return 4;
+      return Math.max(...alternatives.map(alt => similarity(alt, answer))) >= 0.8 ? 3 : 2;
+    }
+
+    function schedule(card, quality, now) {
+      // Misma fórmula que VocabularyCard.update
+      if (quality < 3) {
+        card.interval = 1;
+        card.reps = 0;
+        card.fail_count += 1;
+      } else {
+        card.interval = card.interval * card.ease + 0.1;
+        card.reps += 1;
+      }
+      card.ease = Math.max(1.3, card.ease + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)));
+      card.due = now + Math.floor(card.interval) * 86400;
+      card.reviewed_at = now;
+    }
+
+    function showNext() {
+      const now = Date.now() / 1000;
+      const due = Object.values(deck.cards).filter(card => card.due < now);
+      document.getElementById('review-feedback').style.display = 'none';
+      if (!due.length) {
+        current = null;
+        document.getElementById('review-card').style.display = 'none';
+        document.getElementById('review-empty').style.display = 'block';
+        return;
+      }
+      current = due[Math.floor(Math.random() * due.length)];
+      document.getElementById('review-empty').style.display = 'none';
+      document.getElementById('review-card').style.display = 'block';
+      document.getElementById('review-word').textContent = current.norwegian;
+      const input = document.getElementById('review-answer');
+      input.value = '';
+      input.focus();
+    }
+
+    document.getElementById('review-form').addEventListener('submit', event => {
+      event.preventDefault();
+      const answer = normalize(document.getElementById('review-answer').value);
+      const now = Date.now() / 1000;
+      const quality = grade(current, answer);
+      schedule(current, quality, now);
+      queue.push({card_id: current.id, answer: answer, answered_at: now});
+      persist();
+
+      const labels = {4: '¡Correcto!', 3: 'Casi correcto.', 2: 'Incorrecto.'};
+      const feedback = document.getElementById('review-feedback');
+      feedback.className = 'card feedback-card ' + (quality === 4 ? 'correct' : 'incorrect');
+      document.getElementById('review-message').textContent =
+        labels[quality] + " '" + current.norwegian + "' significa '" + current.english + "'";
+      document.getElementById('review-card').style.display = 'none';
+      feedback.style.display = 'block';
+      // Se sube la cola en segundo plano; si falla se reintentará más tarde
+      if (navigator.onLine) sync();
+    });
+    document.getElementById('review-next').addEventListener('click', showNext);
+    window.addEventListener('online', sync);
+
+    if ('serviceWorker' in navigator) {
+      navigator.serviceWorker.register('{{ url_for('service_worker') }}');
+    }
+    sync().then(showNext);
+  </script>
+{% endblock %}
+""",
+    "service_worker": """
+// Service worker del modo sin conexión: guarda la página en caché para poder
+// abrirla sin red. Los datos del mazo los gestiona la propia página.
+const CACHE = 'norsk-srs-v1';
+const SHELL = ['{{ url_for('offline') }}'];
+
+self.addEventListener('install', event => {
+  event.waitUntil(caches.open(CACHE).then(cache => cache.addAll(SHELL)));
+  self.skipWaiting();
+});
+
+self.addEventListener('activate', event => {
+  event.waitUntil(caches.keys().then(keys =>
+    Promise.all(keys.filter(key => key !== CACHE).map(key => caches.delete(key)))));
+  self.clients.claim();
+});
+
+self.addEventListener('fetch', event => {
+  const url = new URL(event.request.url);
+  if (event.request.method !== 'GET' || !SHELL.includes(url.pathname)) {
+    return;
+  }
+  // Red primero para tener la página actualizada; caché si no hay conexión
+  event.respondWith(
+    fetch(event.request)
+      .then(response => {
+        const copy = response.clone();
+        caches.open(CACHE).then(cache => cache.put(event.request, copy));
+        return response;
+      })
+      .catch(() => caches.match(event.request))
+  );
+});
+""",
+    "history": """
+{% extends "base" %}
+{% block content %}
+    <div class="stats-header">
+        <button onclick="window.location.href='{{ url_for('stats') }}'" class="back-button">
+            ← Volver
+        </button>
+        <h1>Historial</h1>
+    </div>
+
+    <div class="card">
+        <form method="get" action="{{ url_for('stats_history') }}">
+            <label for="days">Periodo:</label>
+            <select id="days" name="days" onchange="this.form.submit()">
+                {% for value, label in [(7, "Última semana"), (30, "Último mes"), (90, "Últimos 3 meses"), (365, "Último año"), (1825, "Últimos 5 años")] %}
+                <option value="{{ value }}" {% if (end - start).days + 1 == value %}selected{% endif %}>{{ label }}</option>
+                {% endfor %}
+            </select>
+        </form>
+    </div>
+
+    {% if points %}
+    <div class="stats-card">
+        <h2>Revisiones por {{ {"day": "día", "week": "semana", "month": "mes"}[bucket] }}</h2>
+        <svg viewBox="0 0 {{ points|length * 20 }} 120" preserveAspectRatio="none" style="width: 100%; height: 200px">
+            {% for point in points %}
+            {% set total = 100 * point.reviews / max_reviews %}
+            {% set correct = 100 * point.correct / max_reviews %}
+            <rect x="{{ loop.index0 * 20 + 2 }}" y="{{ 110 - total }}" width="16" height="{{ total }}" fill="#f44336">
+                <title>{{ point.date }}: {{ point.reviews }} revisiones, {{ point.accuracy }}% correctas, {{ point.near_miss }} casi correctas</title>
+            </rect>
+            <rect x="{{ loop.index0 * 20 + 2 }}" y="{{ 110 - correct }}" width="16" height="{{ correct }}" fill="#4CAF50"></rect>
+            {% endfor %}
+        </svg>
+    </div>
+
+    <div class="words-grid">
+        {% for point in points|reverse %}
+        <div class="word-card detailed">
+            <div class="word-norwegian">{{ point.date }}</div>
+            <div class="word-stats">
+                <span>Revisiones: {{ point.reviews }} ({{ point.accuracy }}% correctas)</span>
+                <span>Casi correctas: {{ point.near_miss }}</span>
+                <span>Dominadas: {{ point.mastered }} | Aprendiendo: {{ point.learning }} | Nuevas: {{ point.new }}</span>
+            </div>
+        </div>
+        {% endfor %}
+    </div>
+    {% else %}
+    <p class="no-cards">No hay revisiones en este periodo.</p>
+    {% endif %}
+{% endblock %}
+""",
+    "profiles": """
+{% extends "base" %}
+{% block content %}
+    <div class="stats-header">
+        <button onclick="window.location.href='{{ url_for('index') }}'" class="back-button">
+            ← Volver
+        </button>
+        <h1>Perfiles de Peticiones</h1>
+    </div>
+    {% if not enabled %}
+    <p class="no-cards">El perfilado está desactivado (PROFILE_REQUESTS=1 para activarlo).</p>
+    {% endif %}
+    {% if profiles %}
+    <div class="words-grid">
+        {% for profile in profiles %}
+        <div class="word-card detailed">
+            <div class="word-norwegian">{{ profile.route }}</div>
+            <div class="word-stats">
+                <span>{{ profile.time }}</span>
+                <span>Duración: {{ profile.elapsed_ms }} ms</span>
+                <span>
+                    <a href="{{ url_for('admin_profile', name=profile.name, format='text', token=token) }}">Resumen</a> |
+                    <a href="{{ url_for('admin_profile', name=profile.name, token=token) }}">Descargar .prof</a>
+                </span>
+            </div>
+        </div>
+        {% endfor %}
+    </div>
+    {% else %}
+    <p class="no-cards">No hay perfiles guardados todavía.</p>
+    {% endif %}
 {% endblock %}
 """,
     "stats": """
@@ -769,6 +970,12 @@ templates = {
             ← Volver
         </button>
         <h1>Estadísticas Detalladas</h1>
+        <button onclick="window.location.href='{{ url_for('search') }}'" class="back-button">
+            Buscar
+        </button>
+        <button onclick="window.location.href='{{ url_for('stats_history') }}'" class="back-button">
+            Historial
+        </button>
     </div>
 
     <div class="stats-card">
@@ -833,11 +1040,56 @@ templates = {
         </div>
     </div>
 {% endblock %}
+""",
+    "search": """
+{% extends "base" %}
+{% block content %}
+    <div class="stats-header">
+        <button onclick="window.location.href='{{ url_for('index') }}'" class="back-button">
+            ← Volver
+        </button>
+        <h1>Buscar Palabras</h1>
+    </div>
+
+    <div class="card">
+        <form method="get" action="{{ url_for('search') }}" autocomplete="off">
+            <input type="text"
+                   name="q"
+                   value="{{ query }}"
+                   autofocus
+                   placeholder="Busca en noruego o en inglés..."
+                   autocapitalize="off">
+            <button type="submit">Buscar</button>
+        </form>
+    </div>
+
+    {% if query %}
+    <div class="words-section">
+        <h2>Resultados ({{ results|length }})</h2>
+        {% if results %}
+        <div class="words-grid">
+            {% for card, field, text, score in results %}
+            <div class="word-card detailed" onclick="showWordDetails('{{ card.norwegian }}', '{{ card.english }}', {{ card.ease }}, {{ card.reps }}, {{ card.fail_count }}, '{{ card.due_date.isoformat() }}')">
+                <div class="word-norwegian">{{ card.norwegian }}</div>
+                <div class="word-stats">
+                    <span>Significado: {{ card.english }}</span>
+                    <span>Similitud: {{ "%.0f"|format(score * 100) }}%</span>
+                </div>
+            </div>
+            {% endfor %}
+        </div>
+        {% else %}
+        <p class="no-cards">No se encontraron palabras.</p>
+        {% endif %}
+    </div>
+    {% endif %}
+{% endblock %}
 """
 }
 
-# Configuramos el entorno Jinja2 usando DictLoader
-env = Environment(loader=DictLoader(templates))
+# Configuramos el entorno Jinja2 usando DictLoader; con autoescape porque
+# algunas plantillas muestran texto del usuario (la consulta de /search)
+env = Environment(loader=DictLoader(templates), autoescape=True)
 # Añadimos las funciones de Flask al entorno
 env.globals.update({
     "get_flashed_messages": get_flashed_messages,
@@ -851,34 +1103,37 @@ def render(template_name, **context):
 # ---------------------------
 # Rutas de la aplicación
 # ---------------------------
+@app.before_request
+def reload_vocabulary():
+    # Recarga en caliente si el Excel ha cambiado (reconstruye el índice de búsqueda)
+    srs.reload_if_changed()
+
 @app.route("/", methods=["GET"])
 def index():
+    cards = srs.cards  # Instantánea: una recarga en paralelo no afecta a esta petición
     # Seleccionar una tarjeta pendiente
-    due_cards = srs.get_due_cards()
-    if due_cards:
-        card = random.choice(due_cards)
+    card = srs.pick_card()
+    if card is not None:
         session["current_card_id"] = card.id
-    else:
-        card = None
         
     # Mejorar la selección de palabras aprendidas y falladas
     learned_cards = sorted(
-        [card for card in srs.cards if card.reps > 0],
+        [card for card in cards if card.reps > 0],
         key=lambda x: x.reps,
         reverse=True
     )[:10]  # Top 10 palabras más practicadas
     
     failed_cards = sorted(
-        [card for card in srs.cards if card.fail_count > 0],
+        [card for card in cards if card.fail_count > 0],
         key=lambda x: x.fail_count,
         reverse=True
     )[:10]  # Top 10 palabras más falladas
     
     # Calcular estadísticas generales
-    total_cards = len(srs.cards)
-    mastered_cards = len([card for card in srs.cards if card.reps >= 5 and card.ease >= 2.5])
-    learning_cards = len([card for card in srs.cards if 0 < card.reps < 5])
-    new_cards = len([card for card in srs.cards if card.reps == 0])
+    total_cards = len(cards)
+    mastered_cards = len([card for card in cards if card.reps >= 5 and card.ease >= 2.5])
+    learning_cards = len([card for card in cards if 0 < card.reps < 5])
+    new_cards = len([card for card in cards if card.reps == 0])
     
     stats = {
         "total": total_cards,
@@ -914,55 +1169,31 @@ def answer():
         flash("Tarjeta no encontrada.", "incorrect")
         return redirect(url_for("index"))
     
-    # Separamos las alternativas correctas (pueden estar separadas por comas)
-    correct_translations = [alt.strip().lower() for alt in card.english.split(",")]
-    
-    # Comprobamos si la respuesta coincide exactamente con alguna alternativa
-    if any(user_answer == alt for alt in correct_translations):
-        flash(f"¡Correcto! '{card.norwegian}' significa '{card.english}'", "correct")
-        quality = 4
-    else:
-        # Buscamos la mejor coincidencia
-        best_ratio = 0.0
-        best_alt = None
-        for alt in correct_translations:
-            ratio = difflib.SequenceMatcher(None, alt, user_answer).ratio()
-            if ratio > best_ratio:
-                best_ratio = ratio
-                best_alt = alt
-        
-        if best_ratio >= 0.8:
-            diff_str = get_diff(best_alt, user_answer)
-            flash(f"Casi correcto. '{card.norwegian}' significa '{card.english}'. Diferencias: {diff_str}", "incorrect")
-            quality = 3
-        else:
-            flash(f"Incorrecto. '{card.norwegian}' significa '{card.english}'. Tu respuesta fue: '{user_answer}'", "incorrect")
-            quality = 2
-
-    card.update(quality)
-    srs.save_progress()
+    quality, category, message = srs.review(card, user_answer)
+    flash(message, category)
     
     return redirect(url_for("index"))
 
 @app.route("/stats", endpoint="stats")
 def stats_page():
+    cards = srs.cards  # Instantánea: una recarga en paralelo no afecta a esta petición
     # Obtener todas las palabras y categorizarlas
-    total_cards = len(srs.cards)
+    total_cards = len(cards)
     
     mastered_cards = sorted(
-        [card for card in srs.cards if card.reps >= 5 and card.ease >= 2.5],
+        [card for card in cards if card.reps >= 5 and card.ease >= 2.5],
         key=lambda x: x.reps,
         reverse=True
     )
     
     learning_cards = sorted(
-        [card for card in srs.cards if 0 < card.reps < 5],
+        [card for card in cards if 0 < card.reps < 5],
         key=lambda x: x.reps,
         reverse=True
     )
     
     new_cards = sorted(
-        [card for card in srs.cards if card.reps == 0],
+        [card for card in cards if card.reps == 0],
         key=lambda x: x.norwegian
     )
     
@@ -980,6 +1211,235 @@ def stats_page():
     
     return render("stats", stats=stats)
 
+@app.route("/stats/history", endpoint="stats_history")
+def stats_history():
+    try:
+        days = max(1, int(request.args.get("days", 30)))
+        end = date.fromisoformat(request.args["end"]) if "end" in request.args else date.today()
+        start = date.fromisoformat(request.args["start"]) if "start" in request.args else end - timedelta(days=days - 1)
+        bucket, points = srs.rollups.history(start, end, request.args.get("bucket", "auto"))
+    except OverflowError:
+        # Rangos que se salen de las fechas representables (p. ej. days=1000000000)
+        return jsonify({"error": "Rango de fechas fuera de límites"}), 400
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if request.args.get("format") == "json":
+        return jsonify({"start": start.isoformat(), "end": end.isoformat(), "bucket": bucket, "points": points})
+
+    max_reviews = max([point["reviews"] for point in points] or [1]) or 1
+    return render("history", points=points, bucket=bucket, start=start, end=end, max_reviews=max_reviews)
+
+@app.route("/search", endpoint="search")
+def search_page():
+    query = request.args.get("q", "").strip()
+    try:
+        limit = min(int(request.args.get("limit", 20)), 100)
+    except ValueError:
+        limit = 20
+    results = srs.search(query, limit=limit) if query else []
+
+    if request.args.get("format") == "json":
+        return jsonify([
+            {
+                "id": card.id,
+                "norwegian": card.norwegian,
+                "english": card.english,
+                "field": field,
+                "match": text,
+                "score": score
+            }
+            for card, field, text, score in results
+        ])
+
+    return render("search", query=query, results=results)
+
+def card_to_sync(card, full):
+    data = {
+        "id": card.id,
+        "due": card.due_date.timestamp(),
+        "interval": card.interval,
+        "ease": card.ease,
+        "reps": card.reps,
+        "fail_count": card.fail_count,
+        "reviewed_at": card.reviewed_at,
+        "version": card.version
+    }
+    if full:
+        # El texto solo se envía en la sincronización completa
+        data["norwegian"] = card.norwegian
+        data["english"] = card.english
+    return data
+
+def sync_feed(since, deck):
+    # Se reenvía todo si el cliente no tiene nada, si el Excel ha cambiado
+    # desde su última sincronización o si va por delante del servidor (el
+    # progreso se reinició): en ese caso el feed incremental nunca le llegaría
+    version = srs.sync_version
+    deck_changed = deck not in (None, "") and deck != str(srs.data_mtime)
+    full = since <= 0 or since > version or deck_changed
+    cards = srs.cards if full else srs.get_changes_since(since)
+    return {
+        "version": version,
+        "deck": str(srs.data_mtime),
+        "full": full,
+        "cards": [card_to_sync(card, full) for card in cards]
+    }
+
+def parse_offline_answers(answers):
+    """Valida la cola de respuestas sin conexión antes de aplicar ninguna.
+
+    Devuelve una lista de (card_id, answered_at, respuesta) o lanza ValueError.
+    """
+    if not isinstance(answers, list):
+        raise ValueError("answers debe ser una lista")
+    parsed = []
+    now = datetime.now().timestamp()
+    for i, item in enumerate(answers):
+        if not isinstance(item, dict):
+            raise ValueError(f"Respuesta {i} inválida")
+        card_id, answered_at, answer = item.get("card_id"), item.get("answered_at", now), item.get("answer", "")
+        # bool es subclase de int: no se acepta como identificador ni como fecha
+        if not isinstance(card_id, int) or isinstance(card_id, bool):
+            raise ValueError(f"card_id inválido en la respuesta {i}")
+        if not isinstance(answered_at, (int, float)) or isinstance(answered_at, bool) or answered_at != answered_at:
+            raise ValueError(f"answered_at inválido en la respuesta {i}")
+        if not isinstance(answer, str):
+            raise ValueError(f"answer inválido en la respuesta {i}")
+        parsed.append((card_id, min(float(answered_at), now), answer))
+    return parsed
+
+def apply_offline_answers(answers):
+    """Aplica respuestas hechas sin conexión (ya validadas), en orden cronológico.
+
+    Si el servidor ya tiene una revisión más reciente de la tarjeta, la
+    respuesta antigua se descarta como conflicto (gana el servidor).
+    """
+    results = []
+    for card_id, answered_at, answer in sorted(answers, key=lambda item: item[1]):
+        card = srs.get_card_by_id(card_id)
+        if card is None:
+            results.append({"card_id": card_id, "status": "unknown_card"})
+            continue
+        user_answer = normalize_text(answer)
+        with srs.lock:
+            card = srs.get_card_by_id(card.id) or card
+            if answered_at <= card.reviewed_at:
+                results.append({"card_id": card.id, "status": "conflict"})
+                continue
+            quality, category, message = srs.review(card, user_answer, reviewed_at=answered_at)
+        results.append({"card_id": card.id, "status": "applied", "quality": quality, "message": message})
+    return results
+
+@app.route("/sync", methods=["GET", "POST"], endpoint="sync")
+def sync():
+    if request.method == "POST":
+        payload = request.get_json(silent=True)
+        if payload is None:
+            payload = {}
+        if not isinstance(payload, dict):
+            return jsonify({"error": "Se esperaba un objeto JSON"}), 400
+        since, deck = payload.get("since", 0), payload.get("deck")
+    else:
+        since, deck = request.args.get("since", 0), request.args.get("deck")
+    try:
+        since = int(since)
+    except (TypeError, ValueError):
+        return jsonify({"error": "since inválido"}), 400
+
+    results = []
+    if request.method == "POST":
+        # Se valida toda la cola antes de aplicar nada: o se aplica entera o se rechaza
+        try:
+            answers = parse_offline_answers(payload.get("answers", []))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        results = apply_offline_answers(answers)
+
+    feed = sync_feed(since, deck)
+    feed["results"] = results
+    return jsonify(feed)
+
+def token_matches(token, expected):
+    if not expected or token is None:
+        return False
+    return hmac.compare_digest(token.encode("utf-8"), expected.encode("utf-8"))
+
+def is_admin(read_only=False):
+    # El token de administración solo se acepta en la cabecera, para que no
+    # acabe en los logs de acceso ni en el Referer. Las páginas de consulta
+    # admiten además el token de solo lectura, también en `?token=` para
+    # poder abrirlas y enlazarlas desde el navegador
+    token = request.headers.get("X-Admin-Token")
+    if token_matches(token, ADMIN_TOKEN):
+        return True
+    if read_only:
+        return token_matches(token or request.args.get("token"), ADMIN_READ_TOKEN)
+    return False
+
+@app.route("/admin/bulk", methods=["POST"], endpoint="admin_bulk")
+def admin_bulk():
+    if not is_admin():
+        return jsonify({"error": "No autorizado"}), 403
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({"error": "Se esperaba un objeto JSON"}), 400
+    try:
+        cards = srs.bulk_update(payload.get("selector", {}), payload.get("action", {}),
+                                dry_run=bool(payload.get("dry_run")))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({
+        "matched": len(cards),
+        "dry_run": bool(payload.get("dry_run")),
+        "version": srs.sync_version,
+        "ids": [card.id for card in cards]
+    })
+
+@app.route("/admin/profiles", endpoint="admin_profiles")
+def admin_profiles():
+    if not is_admin(read_only=True):
+        return jsonify({"error": "No autorizado"}), 403
+    return render("profiles",
+                  profiles=list_profiles(PROFILE_DIR)[:50],
+                  enabled=isinstance(app.wsgi_app, RequestProfiler),
+                  # Solo se propaga a los enlaces el token de solo lectura
+                  token=request.args.get("token") if token_matches(request.args.get("token"), ADMIN_READ_TOKEN) else "")
+
+@app.route("/admin/profiles/<name>", endpoint="admin_profile")
+def admin_profile(name):
+    if not is_admin(read_only=True):
+        return jsonify({"error": "No autorizado"}), 403
+    if name not in {profile["name"] for profile in list_profiles(PROFILE_DIR)}:
+        return jsonify({"error": "Perfil no encontrado"}), 404
+    path = os.path.join(PROFILE_DIR, name)
+    if request.args.get("format") == "text":
+        return app.response_class(format_profile(path), mimetype="text/plain")
+    # Fichero pstats crudo: snakeviz, flameprof, gprof2dot...
+    return send_file(path, as_attachment=True, download_name=name)
+
+@app.route("/admin/memory", endpoint="admin_memory")
+def admin_memory():
+    if not is_admin(read_only=True):
+        return jsonify({"error": "No autorizado"}), 403
+    return jsonify(dict(process_memory(), pid=os.getpid()))
+
+@app.route("/offline", endpoint="offline")
+def offline_page():
+    return render("offline")
+
+@app.route("/sw.js", endpoint="service_worker")
+def service_worker():
+    return app.response_class(render("service_worker"), mimetype="application/javascript")
+
+# Perfilado bajo demanda: PROFILE_REQUESTS=1 y la cabecera `X-Profile: 1` junto
+# a un X-Admin-Token válido, o PROFILE_SAMPLE_RATE para perfilar una fracción
+# de las peticiones
+if os.environ.get("PROFILE_REQUESTS") == "1":
+    app.wsgi_app = RequestProfiler(app.wsgi_app, app.url_map, PROFILE_DIR,
+                                   sample_rate=float(os.environ.get("PROFILE_SAMPLE_RATE", 0)),
+                                   authorize=lambda environ: token_matches(environ.get("HTTP_X_ADMIN_TOKEN"), ADMIN_TOKEN))
+
 # ---------------------------
 # Ejecución de la aplicación
 # ---------------------------
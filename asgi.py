@@ -0,0 +1,135 @@
+import asyncio
+import importlib
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# ---------------------------
+# Modo asyncio (ASGI)
+# ---------------------------
+# Sirve las mismas rutas de app.py desde un bucle de eventos:
+#   uvicorn asgi:app --host 0.0.0.0 --port 10000
+# El bucle solo gestiona conexiones (muchos clientes keep-alive por proceso).
+# Todo lo que bloquea (cargar el Excel, las vistas y las escrituras de
+# progreso) se ejecuta en un pool de hilos; el núcleo SRS es seguro para hilos.
+
+ASGI_THREADS = int(os.environ.get("ASGI_THREADS", 16))
+
+
+def build_environ(scope, body):
+    """Traduce un scope HTTP de ASGI al environ WSGI que espera Flask."""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin1"),
+        "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+        "QUERY_STRING": scope["query_string"].decode("latin1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "REMOTE_ADDR": client[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+        "CONTENT_LENGTH": str(len(body)),
+    }
+    for name, value in scope["headers"]:
+        name = name.decode("latin1").upper().replace("-", "_")
+        value = value.decode("latin1")
+        if name == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+            continue
+        if name == "CONTENT_LENGTH":
+            continue
+        key = f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def run_wsgi(wsgi_app, environ):
+    """Ejecuta la aplicación WSGI (en un hilo del pool) y devuelve la respuesta completa."""
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response["status"] = int(status.split(" ", 1)[0])
+        response["headers"] = [(name.lower().encode("latin1"), value.encode("latin1")) for name, value in headers]
+        return lambda data: None
+
+    result = wsgi_app(environ, start_response)
+    try:
+        body = b"".join(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return response["status"], response["headers"], body
+
+
+class SRSAsgiApp:
+    def __init__(self, module="app"):
+        self.module = module
+        self.flask_app = None
+        self.executor = ThreadPoolExecutor(max_workers=ASGI_THREADS, thread_name_prefix="srs")
+        self._loading = None
+
+    async def load(self):
+        # Importar app.py construye el mazo leyendo el Excel: fuera del bucle
+        if self._loading is None:
+            loop = asyncio.get_running_loop()
+            self._loading = loop.run_in_executor(self.executor, importlib.import_module, self.module)
+        module = await self._loading
+        self.flask_app = module.app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self.http(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.load()
+                except Exception as e:
+                    await send({"type": "lifespan.startup.failed", "message": repr(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                # Espera a que terminen las escrituras pendientes
+                await asyncio.get_running_loop().run_in_executor(None, self.executor.shutdown, True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def http(self, scope, receive, send):
+        if self.flask_app is None:
+            await self.load()
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+
+        environ = build_environ(scope, b"".join(chunks))
+        loop = asyncio.get_running_loop()
+        status, headers, body = await loop.run_in_executor(self.executor, run_wsgi, self.flask_app, environ)
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+app = SRSAsgiApp()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("asgi:app", host="0.0.0.0", port=int(os.environ.get("PORT", 10000)))
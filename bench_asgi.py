@@ -0,0 +1,128 @@
+import asyncio
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# ---------------------------
+# Comparativa de rendimiento: gunicorn app:app frente a uvicorn asgi:app
+# ---------------------------
+# Arranca ambos servidores sobre una copia temporal del proyecto (para no
+# tocar el progreso real) y lanza el mismo número de clientes keep-alive
+# contra cada uno, mezclando lecturas (/, /stats, /search) y respuestas.
+#   python bench_asgi.py [clientes] [segundos]
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+FILES = ["app.py", "asgi.py", "srs_engine.py", "progress_store.py", "profiling.py", "rollups.py",
+         "vocabulary_norwegian.xlsx", "progress.json"]
+SERVERS = {
+    "gunicorn app:app": ["gunicorn", "app:app", "-b", "127.0.0.1:{port}"],
+    "uvicorn asgi:app": ["uvicorn", "asgi:app", "--host", "127.0.0.1", "--port", "{port}", "--log-level", "warning"],
+}
+REQUESTS = [
+    ("GET", "/", ""),
+    ("GET", "/stats", ""),
+    ("GET", "/search?q=huset", ""),
+    ("POST", "/answer", "card_id={card_id}&answer=a+bath"),
+]
+
+
+async def request(reader, writer, method, path, body):
+    head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(body)}\r\n"
+    if body:
+        head += "Content-Type: application/x-www-form-urlencoded\r\n"
+    writer.write(head.encode() + b"\r\n" + body)
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("conexión cerrada")
+    status = int(status_line.split()[1])
+    length = 0
+    keep_alive = True
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+        elif name.lower() == "connection" and value.strip().lower() == "close":
+            keep_alive = False
+    await reader.readexactly(length)
+    return status, keep_alive
+
+
+async def client(port, deadline, latencies, errors, reconnects, offset):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    i = offset
+    try:
+        while time.perf_counter() < deadline:
+            method, path, body = REQUESTS[i % len(REQUESTS)]
+            # Se reparten las respuestas entre tarjetas distintas, como en un uso real
+            body = body.format(card_id=i % 1000).encode() if body else b""
+            i += 1
+            start = time.perf_counter()
+            try:
+                status, keep_alive = await request(reader, writer, method, path, body)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                errors.append("conexión")
+                keep_alive = False
+            else:
+                latencies.append(time.perf_counter() - start)
+                if status >= 500:
+                    errors.append(status)
+            if not keep_alive:
+                # El servidor no mantiene la conexión (worker sync): se reabre
+                reconnects.append(1)
+                writer.close()
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    finally:
+        writer.close()
+
+
+async def load(port, clients, seconds):
+    latencies, errors, reconnects = [], [], []
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(*(client(port, deadline, latencies, errors, reconnects, i) for i in range(clients)))
+    return latencies, errors, reconnects
+
+
+def wait_ready(port, timeout=60):
+    import urllib.request
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/stats", timeout=5)
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f"El servidor del puerto {port} no arrancó")
+
+
+def main(clients=50, seconds=10):
+    print(f"{clients} clientes keep-alive, {seconds} s por servidor\n")
+    print(f"{'servidor':<20}{'peticiones':>12}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errores':>10}{'reconexiones':>14}")
+    for port, (name, command) in enumerate(SERVERS.items(), start=18100):
+        tmp_dir = tempfile.mkdtemp()
+        for filename in FILES:
+            shutil.copy(os.path.join(BASE_DIR, filename), tmp_dir)
+        server = subprocess.Popen([part.format(port=port) for part in command], cwd=tmp_dir,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_ready(port)
+            latencies, errors, reconnects = asyncio.run(load(port, clients, seconds))
+        finally:
+            server.terminate()
+            server.wait()
+            shutil.rmtree(tmp_dir)
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+        print(f"{name:<20}{len(latencies):>12}{len(latencies) / seconds:>10.1f}{p50:>10.1f}{p99:>10.1f}{len(errors):>10}{len(reconnects):>14}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,89 @@
+import argparse
+import json
+import sys
+
+from srs_engine import EXCEL_PATH, SpacedRepetitionSystem
+
+# ---------------------------
+# Operaciones masivas desde la línea de comandos
+# ---------------------------
+# Ejemplos:
+#   python bulk.py --overdue postpone --days 7
+#   python bulk.py --category learning reset --fields fail_count
+#   python bulk.py --ids 3,8,21 reschedule --due now
+#   python bulk.py --all reset
+# Con el servidor en marcha es preferible usar POST /admin/bulk, ya que los
+# workers no releen el progreso escrito por otro proceso.
+
+
+def id_list(value):
+    try:
+        return [int(card_id) for card_id in value.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Lista de ids inválida: {value}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Aplica una operación a muchas tarjetas a la vez.")
+    parser.add_argument("--all", action="store_true", help="Todas las tarjetas (sin otros criterios)")
+    parser.add_argument("--ids", type=id_list, help="Lista de ids separados por comas")
+    parser.add_argument("--due-after", help="Fecha ISO o 'now'")
+    parser.add_argument("--due-before", help="Fecha ISO o 'now'")
+    parser.add_argument("--overdue", action="store_true", help="Solo tarjetas ya vencidas")
+    parser.add_argument("--category", choices=["mastered", "learning", "new"])
+    parser.add_argument("--min-fails", type=int, help="Fallos mínimos")
+    parser.add_argument("--dry-run", action="store_true", help="Muestra las tarjetas sin modificarlas")
+
+    actions = parser.add_subparsers(dest="action", required=True)
+    reschedule = actions.add_parser("reschedule", help="Fija una nueva fecha de revisión")
+    reschedule.add_argument("--due", default="now", help="Fecha ISO o 'now'")
+    postpone = actions.add_parser("postpone", help="Retrasa la fecha de revisión")
+    postpone.add_argument("--days", type=float, required=True)
+    reset = actions.add_parser("reset", help="Reinicia la planificación")
+    reset.add_argument("--fields", help="Campos separados por comas (por defecto todos)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    selector = {}
+    if args.all:
+        selector["all"] = True
+    if args.ids:
+        selector["ids"] = args.ids
+    if args.due_after:
+        selector["due_after"] = args.due_after
+    if args.due_before:
+        selector["due_before"] = args.due_before
+    if args.overdue:
+        selector["overdue"] = True
+    if args.category:
+        selector["category"] = args.category
+    if args.min_fails is not None:
+        selector["min_fails"] = args.min_fails
+
+    action = {"type": args.action}
+    if args.action == "reschedule":
+        action["due"] = args.due
+    elif args.action == "postpone":
+        action["days"] = args.days
+    elif args.fields:
+        action["fields"] = args.fields.split(",")
+
+    srs = SpacedRepetitionSystem(EXCEL_PATH)
+    try:
+        cards = srs.bulk_update(selector, action, dry_run=args.dry_run)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    prefix = "Se modificarían" if args.dry_run else "Modificadas"
+    print(f"{prefix} {len(cards)} tarjetas")
+    if args.dry_run:
+        print(json.dumps([card.id for card in cards]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,2 +1,56 @@
+import gc
+import os
+
 bind = "0.0.0.0:10000"
-workers = 2 
\ No newline at end of file
+# El núcleo SRS es seguro para hilos, así que se usan workers gthread: la
+# concurrencia se obtiene con GUNICORN_THREADS dentro de un único worker.
+workers = int(os.environ.get("GUNICORN_WORKERS", 1))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+
+# Cada worker guarda en memoria su propio estado mutable (versiones de
+# sincronización, agregados diarios, confusiones) y lo escribe en ficheros
+# compartidos sin coordinarse con los demás: con varios workers se pisarían
+# las versiones de /sync, los agregados y confusions.json. Hasta que esos
+# ficheros sean seguros entre procesos solo se admite un worker.
+if workers > 1:
+    raise SystemExit("GUNICORN_WORKERS > 1 no está soportado: el progreso, los agregados y las "
+                     "confusiones no son seguros entre procesos. Usa GUNICORN_THREADS.")
+
+# Modo preload (GUNICORN_PRELOAD=1): el master importa app.py y construye el
+# mazo (Excel e índices) una sola vez. Como solo hay un worker, no se comparte
+# un mazo entre varios workers: lo que se gana es que el worker comparte esas
+# páginas copy-on-write con el master en lugar de duplicarlas y que, al
+# reiniciarse (max_requests, timeout, un fallo), no vuelve a leer el Excel;
+# solo relee el progreso, los agregados y las confusiones (ver after_fork).
+# El log de post_worker_init muestra la memoria compartida con el master.
+preload_app = os.environ.get("GUNICORN_PRELOAD") == "1"
+
+if preload_app:
+    # Sin recolecciones en el master: mover objetos entre generaciones
+    # escribe en sus cabeceras y rompería la compartición
+    gc.disable()
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        # Todo lo creado hasta ahora pasa a la generación permanente y el
+        # recolector de los workers no volverá a tocarlo
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from app import srs
+
+        srs.after_fork()
+        gc.enable()
+
+
+def post_worker_init(worker):
+    from profiling import process_memory
+
+    usage = process_memory()
+    if usage:
+        worker.log.info("Worker %s: RSS %d KiB, PSS %d KiB, compartida %d KiB (ahorro %d KiB)",
+                        worker.pid, usage["rss"], usage["pss"], usage["shared"], usage["saved"])
@@ -0,0 +1,130 @@
+import cProfile
+import io
+import os
+import pstats
+import random
+import threading
+import time
+
+# ---------------------------
+# Perfilado de peticiones bajo demanda
+# ---------------------------
+# Middleware WSGI que ejecuta una petición dentro de cProfile y guarda el
+# resultado (formato pstats, válido para snakeviz, flameprof o gprof2dot).
+# Solo se instala si está activado, así que desactivado no cuesta nada.
+
+
+class RequestProfiler:
+    """Perfila las peticiones con la cabecera `X-Profile: 1` o una fracción aleatoria de ellas.
+
+    La cabecera solo se atiende si `authorize(environ)` la acepta; sin
+    `authorize` se ignora y solo cuenta el muestreo.
+    """
+
+    HEADER = "HTTP_X_PROFILE"
+
+    def __init__(self, wsgi_app, url_map, profile_dir, sample_rate=0.0, keep=200, authorize=None):
+        self.wsgi_app = wsgi_app
+        self.authorize = authorize
+        self.url_map = url_map
+        self.profile_dir = profile_dir
+        self.sample_rate = sample_rate
+        self.keep = keep
+        # cProfile solo admite un perfilador activo por proceso
+        self._active = threading.Lock()
+        os.makedirs(profile_dir, exist_ok=True)
+
+    def __call__(self, environ, start_response):
+        # Cualquiera puede enviar la cabecera: sin autorización no se perfila
+        requested = environ.get(self.HEADER) == "1" and self.authorize is not None and self.authorize(environ)
+        wanted = requested or random.random() < self.sample_rate
+        if not wanted or not self._active.acquire(blocking=False):
+            return self.wsgi_app(environ, start_response)
+
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            profiler.enable()
+            try:
+                # Se consume la respuesta dentro del perfil para incluir el render
+                response = self.wsgi_app(environ, start_response)
+                body = list(response)
+                if hasattr(response, "close"):
+                    response.close()
+            finally:
+                profiler.disable()
+        finally:
+            self._active.release()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.save(profiler, self.route_name(environ), elapsed_ms)
+        return body
+
+    def route_name(self, environ):
+        try:
+            endpoint, _ = self.url_map.bind_to_environ(environ).match()
+        except Exception:
+            endpoint = "unmatched"
+        return endpoint.replace(".", "_")
+
+    def save(self, profiler, route, elapsed_ms):
+        now = time.time()
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now))
+        name = f"{stamp}-{int(now * 1000) % 1000:03d}-{route}-{elapsed_ms:.0f}ms.prof"
+        profiler.dump_stats(os.path.join(self.profile_dir, name))
+        # Se conservan solo los `keep` perfiles más recientes
+        for old in list_profiles(self.profile_dir)[self.keep:]:
+            os.remove(os.path.join(self.profile_dir, old["name"]))
+
+
+def list_profiles(profile_dir):
+    """Devuelve los perfiles guardados, del más reciente al más antiguo."""
+    if not os.path.isdir(profile_dir):
+        return []
+    profiles = []
+    for name in os.listdir(profile_dir):
+        if not name.endswith(".prof"):
+            continue
+        parts = name[:-len(".prof")].split("-")
+        # fecha-hora-milisegundos-ruta-duración; los demás ficheros se ignoran
+        if len(parts) < 5 or not parts[-1].endswith("ms"):
+            continue
+        try:
+            elapsed_ms = int(parts[-1][:-2])
+        except ValueError:
+            continue
+        profiles.append({
+            "name": name,
+            "time": f"{parts[0]} {parts[1]}",
+            "route": "-".join(parts[3:-1]),
+            "elapsed_ms": elapsed_ms,
+        })
+    return sorted(profiles, key=lambda profile: profile["name"], reverse=True)
+
+
+def format_profile(path, limit=30):
+    """Resumen en texto de un perfil, ordenado por tiempo acumulado."""
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+
+def process_memory():
+    """Memoria del proceso en KiB según /proc/self/smaps_rollup (solo Linux).
+
+    `shared` es la parte compartida con otros procesos (p. ej. el mazo
+    precargado en el master de gunicorn) y `pss` reparte esa parte entre
+    quienes la comparten; `rss - pss` es lo que ahorra este worker.
+    """
+    fields = {"Rss": "rss", "Pss": "pss", "Shared_Clean": "shared", "Shared_Dirty": "shared",
+              "Private_Clean": "private", "Private_Dirty": "private"}
+    usage = {"rss": 0, "pss": 0, "shared": 0, "private": 0}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in fields:
+                    usage[fields[key]] += int(value.split()[0])
+    except OSError:
+        return {}
+    usage["saved"] = usage["rss"] - usage["pss"]
+    return usage
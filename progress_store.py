@@ -0,0 +1,180 @@
+import json
+import mmap
+import os
+import struct
+from datetime import datetime
+
+# ---------------------------
+# Formato binario de progreso
+# ---------------------------
+# Cabecera: magic, versión, tamaño de registro y número de registros.
+# Cada registro guarda solo los campos de planificación de una tarjeta,
+# con las fechas como timestamps epoch.
+MAGIC = b"NAPG"
+VERSION = 2
+HEADER = struct.Struct("<4sHHI")
+# id, due, interval, ease, reps, fail_count, versión de sincronización, última revisión
+RECORD = struct.Struct("<IdddIIQd")
+RECORD_V1 = struct.Struct("<IdddII")
+
+
+class ProgressFormatError(ValueError):
+    pass
+
+
+def card_to_record(card):
+    return (card.id, card.due_date.timestamp(), card.interval, card.ease, card.reps, card.fail_count,
+            card.version, card.reviewed_at)
+
+
+class ProgressStore:
+    """Fichero de registros de ancho fijo indexados por id de tarjeta, leído mediante mmap.
+
+    Actualizar una tarjeta solo reescribe su registro dentro del fichero.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = {}  # card_id -> posición del registro
+        self._file = None
+        self._mmap = None
+
+    def open(self):
+        self.close()
+        if not os.path.exists(self.path):
+            self._write_file([])
+        self._file = open(self.path, "r+b")
+        self._mmap = mmap.mmap(self._file.fileno(), 0)
+        magic, version, record_size, count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ProgressFormatError(f"{self.path} no es un fichero de progreso")
+        if version == 1 and record_size == RECORD_V1.size:
+            self._upgrade_v1(count)
+            return
+        if version != VERSION or record_size != RECORD.size:
+            raise ProgressFormatError(f"Versión de progreso no soportada: {version}")
+        self.offsets = {}
+        for i in range(count):
+            offset = HEADER.size + i * RECORD.size
+            self.offsets[struct.unpack_from("<I", self._mmap, offset)[0]] = offset
+
+    def _upgrade_v1(self, count):
+        # v1 no tenía versión de sincronización ni fecha de última revisión
+        records = []
+        for i in range(count):
+            records.append(RECORD_V1.unpack_from(self._mmap, HEADER.size + i * RECORD_V1.size) + (0, 0.0))
+        self.write_records(records)
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+        self._mmap = None
+        self._file = None
+
+    def records(self):
+        for offset in self.offsets.values():
+            yield RECORD.unpack_from(self._mmap, offset)
+
+    def load_into(self, cards_by_id):
+        """Aplica los registros guardados a las tarjetas y devuelve las que no tienen registro."""
+        for card_id, due, interval, ease, reps, fail_count, version, reviewed_at in self.records():
+            card = cards_by_id.get(card_id)
+            if card is None:
+                continue
+            card.due_date = datetime.fromtimestamp(due)
+            card.interval = interval
+            card.ease = ease
+            card.reps = reps
+            card.fail_count = fail_count
+            card.version = version
+            card.reviewed_at = reviewed_at
+        return [card for card_id, card in cards_by_id.items() if card_id not in self.offsets]
+
+    def write_card(self, card):
+        offset = self.offsets.get(card.id)
+        if offset is None:
+            self.append([card])
+            return
+        RECORD.pack_into(self._mmap, offset, *card_to_record(card))
+        # msync solo de la página que contiene el registro
+        start = offset - offset % mmap.ALLOCATIONGRANULARITY
+        self._mmap.flush(start, offset + RECORD.size - start)
+
+    def write_cards(self, cards):
+        """Reescribe en sitio los registros de varias tarjetas con un único msync."""
+        missing = []
+        for card in cards:
+            offset = self.offsets.get(card.id)
+            if offset is None:
+                missing.append(card)
+            else:
+                RECORD.pack_into(self._mmap, offset, *card_to_record(card))
+        self._mmap.flush()
+        self.append(missing)
+
+    def append(self, cards):
+        if not cards:
+            return
+        count = len(self.offsets) + len(cards)
+        self.close()
+        with open(self.path, "r+b") as f:
+            # Se escribe justo tras el último registro de la cabecera: si un
+            # append anterior se interrumpió antes de actualizarla, sus
+            # registros huérfanos se descartan
+            f.seek(HEADER.size + len(self.offsets) * RECORD.size)
+            f.truncate()
+            for card in cards:
+                f.write(RECORD.pack(*card_to_record(card)))
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, count))
+        self.open()
+
+    def write_all(self, cards):
+        self.write_records([card_to_record(card) for card in cards])
+
+    def write_records(self, records):
+        self.close()
+        self._write_file(records)
+        self.open()
+
+    def _write_file(self, records):
+        # Escritura atómica: fichero temporal + rename
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, len(records)))
+            for record in records:
+                f.write(RECORD.pack(*record))
+        os.replace(tmp_path, self.path)
+
+
+def migrate_json_progress(json_path, store):
+    """Convierte un progress.json antiguo (lista de tarjetas completas) al formato binario."""
+    with open(json_path, "r") as f:
+        progress = json.load(f)
+    records = []
+    for position, data in enumerate(progress):
+        records.append((
+            data.get("id", position),
+            datetime.fromisoformat(data["due_date"]).timestamp(),
+            data["interval"],
+            data["ease"],
+            data["reps"],
+            data["fail_count"],
+            0,
+            0.0,
+        ))
+    store.write_records(records)
+    return len(records)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 3:
+        print("Uso: python progress_store.py progress.json progress.bin")
+        sys.exit(1)
+    store = ProgressStore(sys.argv[2])
+    migrated = migrate_json_progress(sys.argv[1], store)
+    store.close()
+    print(f"{migrated} tarjetas migradas a {sys.argv[2]}")
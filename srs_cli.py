@@ -0,0 +1,174 @@
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+import tempfile
+from collections import Counter
+from datetime import datetime
+
+from srs_engine import (EXCEL_PATH, PROGRESS_PATH, LEGACY_PROGRESS_PATH, CONFUSIONS_PATH, ROLLUPS_PATH,
+                        SpacedRepetitionSystem, normalize_text)
+
+# ---------------------------
+# Repasos y corrección masiva desde la línea de comandos
+# ---------------------------
+# Usa el motor SRS directamente, sin Flask ni plantillas:
+#   python srs_cli.py review
+#   python srs_cli.py grade respuestas.csv --dry-run
+# El fichero de respuestas es CSV (o JSON Lines si acaba en .jsonl) con las
+# columnas `card_id` o `norwegian`, `answer` y opcionalmente `answered_at`
+# (timestamp epoch).
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Repasa tarjetas o corrige ficheros de respuestas.")
+    parser.add_argument("--excel", default=EXCEL_PATH, help="Excel de vocabulario")
+    parser.add_argument("--progress", default=PROGRESS_PATH, help="Fichero de progreso")
+    parser.add_argument("--confusions", default=CONFUSIONS_PATH, help="Fichero de confusiones")
+    parser.add_argument("--rollups", default=ROLLUPS_PATH, help="Fichero de agregados diarios")
+    parser.add_argument("--strategy", choices=SpacedRepetitionSystem.STRATEGIES, default="weighted")
+
+    commands = parser.add_subparsers(dest="command", required=True)
+    review = commands.add_parser("review", help="Repaso interactivo de las tarjetas pendientes")
+    review.add_argument("--limit", type=int, default=20, help="Número máximo de tarjetas")
+    grade = commands.add_parser("grade", help="Corrige un fichero de respuestas")
+    grade.add_argument("answers", help="Fichero CSV o JSON Lines")
+    grade.add_argument("--dry-run", action="store_true", help="Solo corrige, sin guardar el progreso")
+    grade.add_argument("--output", help="Escribe el resultado de cada respuesta en este CSV")
+    return parser
+
+
+def read_answers(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            return [json.loads(line) for line in f if line.strip()]
+        return list(csv.DictReader(f))
+
+
+def run_review(srs, limit):
+    reviewed = 0
+    while reviewed < limit:
+        card = srs.pick_card()
+        if card is None:
+            print("¡No hay tarjetas pendientes por ahora!")
+            break
+        try:
+            answer = input(f"\n{card.norwegian} → ")
+        except EOFError:
+            break
+        if not answer.strip():
+            break
+        quality, category, message = srs.review(card, answer.strip().lower())
+        print(message)
+        reviewed += 1
+    print(f"\n{reviewed} tarjetas repasadas")
+
+
+def parse_row(srs, row, by_norwegian, now):
+    """Valida una fila del fichero y devuelve (tarjeta, respuesta, answered_at) o lanza ValueError."""
+    if not isinstance(row, dict):
+        raise ValueError("Fila inválida")
+    if row.get("card_id") not in (None, ""):
+        try:
+            card = srs.get_card_by_id(int(row["card_id"]))
+        except (TypeError, ValueError):
+            card = None
+    else:
+        card = by_norwegian.get(normalize_text(row.get("norwegian", "")))
+    if card is None:
+        raise ValueError("Tarjeta no encontrada")
+
+    answered_at = None
+    if row.get("answered_at") not in (None, ""):
+        try:
+            answered_at = float(row["answered_at"])
+        except (TypeError, ValueError):
+            answered_at = float("nan")
+        if not 0 <= answered_at < float("inf"):
+            raise ValueError(f"answered_at inválido: {row['answered_at']}")
+        # Como en /sync, una fecha futura cuenta como ahora
+        answered_at = min(answered_at, now)
+    return card, str(row.get("answer", "")).strip().lower(), answered_at
+
+
+def run_grade(srs, path, dry_run, output):
+    by_norwegian = {normalize_text(card.norwegian): card for card in srs.cards}
+    now = datetime.now().timestamp()
+    # Se validan todas las filas antes de guardar nada: una fila errónea no
+    # deja el fichero aplicado a medias, solo aparece como no corregida
+    rows = []
+    for row in read_answers(path):
+        try:
+            rows.append((row, parse_row(srs, row, by_norwegian, now), None))
+        except ValueError as e:
+            rows.append((row, None, str(e)))
+
+    results = []
+    for row, parsed, error in rows:
+        if error is not None:
+            fields = row if isinstance(row, dict) else {}
+            results.append({"card_id": fields.get("card_id"), "norwegian": fields.get("norwegian"),
+                            "answer": fields.get("answer"), "quality": "", "message": error})
+            continue
+
+        card, user_answer, answered_at = parsed
+        if dry_run:
+            quality, category, message = srs.grade(card, user_answer, record_confusions=False)
+        else:
+            quality, category, message = srs.review(card, user_answer, reviewed_at=answered_at)
+        results.append({"card_id": card.id, "norwegian": card.norwegian, "answer": user_answer,
+                        "quality": quality, "message": message})
+
+    if output:
+        with open(output, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=["card_id", "norwegian", "answer", "quality", "message"])
+            writer.writeheader()
+            writer.writerows(results)
+
+    labels = {4: "correctas", 3: "casi correctas", 2: "incorrectas", "": "no corregidas"}
+    counts = Counter(result["quality"] for result in results)
+    summary = ", ".join(f"{counts[quality]} {label}" for quality, label in labels.items() if counts[quality])
+    print(f"{len(results)} respuestas{' (sin guardar)' if dry_run else ''}: {summary or 'ninguna'}")
+    return 0 if counts[""] == 0 else 1
+
+
+def copy_stores(args, tmp_dir):
+    """Copia los ficheros de estado a `tmp_dir` y devuelve sus nuevas rutas.
+
+    Construir el motor migra progress.json y crea los ficheros que falten;
+    en una corrección en seco eso ocurre sobre las copias.
+    """
+    paths = {}
+    for name, path in [("progress_file", args.progress), ("legacy_progress_file", LEGACY_PROGRESS_PATH),
+                       ("confusions_file", args.confusions), ("rollups_file", args.rollups)]:
+        paths[name] = os.path.join(tmp_dir, name)
+        if os.path.exists(path):
+            shutil.copy(path, paths[name])
+    return paths
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "grade" and args.dry_run:
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            srs = SpacedRepetitionSystem(args.excel, strategy=args.strategy, **copy_stores(args, tmp_dir))
+            try:
+                return run_grade(srs, args.answers, True, args.output)
+            finally:
+                srs.progress_store.close()
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    srs = SpacedRepetitionSystem(args.excel, progress_file=args.progress, confusions_file=args.confusions,
+                                 strategy=args.strategy, rollups_file=args.rollups)
+    if args.command == "review":
+        run_review(srs, args.limit)
+        return 0
+    return run_grade(srs, args.answers, args.dry_run, args.output)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,716 @@
+import random
+import difflib
+import heapq
+import bisect
+import threading
+from array import array
+from collections import defaultdict, Counter
+from datetime import datetime, timedelta, date
+import json
+import os
+from progress_store import ProgressStore, migrate_json_progress
+from rollups import RollupStore
+
+# Motor SRS sin dependencias web: importarlo no lee ficheros ni arranca nada.
+# Las tarjetas y el progreso se cargan al construir SpacedRepetitionSystem.
+
+# Configura las rutas base
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+EXCEL_PATH = os.path.join(BASE_DIR, 'vocabulary_norwegian.xlsx')
+PROGRESS_PATH = os.path.join(BASE_DIR, 'progress.bin')
+LEGACY_PROGRESS_PATH = os.path.join(BASE_DIR, 'progress.json')
+CONFUSIONS_PATH = os.path.join(BASE_DIR, 'confusions.json')
+ROLLUPS_PATH = os.path.join(BASE_DIR, 'rollups.bin')
+
+def is_present(value):
+    """Equivalente a pd.notna para valores sueltos, sin importar pandas."""
+    return value is not None and value == value  # NaN es distinto de sí mismo
+
+# ---------------------------
+# Clases del Sistema SRS
+# ---------------------------
+class VocabularyCard:
+    def __init__(self, data):
+        # Manejar artículos vacíos y valores NaN
+        article = str(data['Article']).strip() if is_present(data['Article']) else ""
+        self.norwegian = f"{article} {data['Norwegian']}".strip() if article else data['Norwegian']
+        self.english = data['English']  # Puede contener varias traducciones separadas por comas
+        self.due_date = datetime.now()
+        self.interval = 1
+        self.ease = 2.5
+        self.reps = 0
+        self.fail_count = 0  # Contador de fallos
+        self.id = None  # Se asignará un ID único en load_data
+        self.version = 0  # Versión de sincronización del último cambio
+        self.reviewed_at = 0.0  # Timestamp epoch de la última revisión
+
+    def update(self, quality, reviewed_at=None):
+        # Se calcula todo antes de asignar para que los lectores sin bloqueo
+        # vean la tarjeta a medio actualizar el menor tiempo posible
+        reviewed = datetime.fromtimestamp(reviewed_at) if reviewed_at else datetime.now()
+        interval, reps, fail_count = self.interval, self.reps, self.fail_count
+        if quality < 3:
+            interval = 1
+            reps = 0
+            fail_count += 1  # Incrementa el contador de fallos si la respuesta es mala
+        else:
+            interval = (interval * self.ease) + 0.1
+            reps += 1
+        
+        ease = max(1.3, self.ease + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)))
+        self.interval, self.reps, self.fail_count, self.ease = interval, reps, fail_count, ease
+        self.due_date = reviewed + timedelta(days=int(interval))
+        self.reviewed_at = reviewed.timestamp()
+
+def card_category(card):
+    """Categoría de la tarjeta tal y como se cuenta en las estadísticas."""
+    if card.reps == 0:
+        return "new"
+    if card.reps < 5:
+        return "learning"
+    if card.ease >= 2.5:
+        return "mastered"
+    return None  # Muchas repeticiones pero facilidad baja: no cuenta en ninguna
+
+# ---------------------------
+# Índice de búsqueda por trigramas
+# ---------------------------
+def normalize_text(text):
+    """Normaliza un texto para compararlo: minúsculas y espacios colapsados."""
+    return " ".join(str(text).lower().split())
+
+def get_trigrams(text):
+    """Devuelve el conjunto de trigramas de caracteres (por palabra) de un texto normalizado."""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+class TrigramIndex:
+    """Índice invertido de trigramas sobre los campos `norwegian` y `english`.
+
+    Cada alternativa (separada por comas) se indexa como una entrada propia,
+    de modo que una búsqueda solo toca las listas de los trigramas de la
+    consulta en lugar de recorrer todas las tarjetas.
+    """
+    FIELDS = ("norwegian", "english")
+
+    def __init__(self, cards=()):
+        # trigrama -> índices de entrada; array en lugar de list para que las
+        # búsquedas no toquen contadores de referencias (páginas compartidas tras fork)
+        self.postings = {}
+        self.entries = []  # (card_id, campo, texto, nº de trigramas)
+        for card in cards:
+            self.add_card(card)
+
+    def add_card(self, card):
+        for field in self.FIELDS:
+            for alt in str(getattr(card, field)).split(","):
+                text = normalize_text(alt)
+                if not text:
+                    continue
+                grams = get_trigrams(text)
+                entry_idx = len(self.entries)
+                self.entries.append((card.id, field, text, len(grams)))
+                for gram in grams:
+                    self.postings.setdefault(gram, array('I')).append(entry_idx)
+
+    def search(self, query, limit=20, min_score=0.3):
+        """Devuelve [(card_id, campo, texto, puntuación)] ordenado por similitud.
+
+        La puntuación es el coeficiente de Dice entre los trigramas de la
+        consulta y los de cada entrada, por lo que tolera errores tipográficos.
+        """
+        query = normalize_text(query)
+        if not query:
+            return []
+        query_grams = get_trigrams(query)
+        hits = defaultdict(int)
+        for gram in query_grams:
+            for entry_idx in self.postings.get(gram, ()):
+                hits[entry_idx] += 1
+
+        # Nos quedamos con la mejor entrada de cada tarjeta
+        best = {}
+        for entry_idx, common in hits.items():
+            card_id, field, text, size = self.entries[entry_idx]
+            score = 2.0 * common / (len(query_grams) + size)
+            if text.startswith(query):
+                score = min(1.0, score + 0.2)  # Favorecer coincidencias de prefijo
+            if score >= min_score and score > best.get(card_id, (0.0,))[0]:
+                best[card_id] = (score, field, text)
+
+        ranked = heapq.nlargest(limit, best.items(), key=lambda item: item[1][0])
+        return [(card_id, field, text, round(score, 3)) for card_id, (score, field, text) in ranked]
+
+# ---------------------------
+# Índice de traducciones confundibles
+# ---------------------------
+class ConfusableIndex:
+    """Índice precalculado de las alternativas en inglés de todas las tarjetas.
+
+    `answers` permite saber en tiempo constante a qué tarjetas pertenece una
+    respuesta normalizada, y `neighbours` guarda para cada tarjeta las
+    tarjetas con traducciones parecidas. Los pares candidatos se obtienen
+    agrupando por trigramas compartidos, así que no se comparan todos con todos.
+    """
+    MIN_SHARED = 2  # Trigramas compartidos mínimos para considerar un par
+    MAX_BLOCK = 50  # Trigramas más frecuentes que esto no generan candidatos
+    MIN_SCORE = 0.6
+
+    def __init__(self, cards=()):
+        self.answers = defaultdict(set)  # alternativa normalizada -> card ids
+        self.neighbours = defaultdict(dict)  # card_id -> {otra card_id: similitud}
+        self.build(cards)
+
+    def build(self, cards):
+        alternatives = []  # (card_id, trigramas)
+        blocks = defaultdict(list)  # trigrama -> índices en `alternatives`
+        for card in cards:
+            for alt in str(card.english).split(","):
+                text = normalize_text(alt)
+                if not text or card.id in self.answers[text]:
+                    continue
+                self.answers[text].add(card.id)
+                grams = get_trigrams(text)
+                for gram in grams:
+                    blocks[gram].append(len(alternatives))
+                alternatives.append((card.id, grams))
+
+        shared = defaultdict(int)
+        for members in blocks.values():
+            if len(members) > self.MAX_BLOCK:
+                continue
+            for i, a in enumerate(members):
+                for b in members[i + 1:]:
+                    shared[a, b] += 1
+
+        for (a, b), common in shared.items():
+            if common < self.MIN_SHARED:
+                continue
+            card_a, grams_a = alternatives[a]
+            card_b, grams_b = alternatives[b]
+            if card_a == card_b:
+                continue
+            score = 2.0 * len(grams_a & grams_b) / (len(grams_a) + len(grams_b))
+            if score >= self.MIN_SCORE:
+                score = round(score, 3)
+                self.neighbours[card_a][card_b] = max(score, self.neighbours[card_a].get(card_b, 0))
+                self.neighbours[card_b][card_a] = max(score, self.neighbours[card_b].get(card_a, 0))
+
+    def lookup(self, answer, exclude=None):
+        """Devuelve los ids de las tarjetas cuya traducción es exactamente `answer`."""
+        return [card_id for card_id in self.answers.get(normalize_text(answer), ()) if card_id != exclude]
+
+# ---------------------------
+# Selección ponderada de tarjetas pendientes
+# ---------------------------
+class FenwickTree:
+    """Árbol de Fenwick de pesos enteros: actualización, suma y búsqueda por prefijo en O(log n).
+
+    Los pesos son enteros para que las restas de `add` sean exactas: con
+    floats quedaría un residuo y el total no volvería a ser 0.
+    """
+    def __init__(self, weights):
+        self.size = len(weights)
+        self.tree = [0] + list(weights)
+        # Construcción en O(n)
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[i]
+
+    def add(self, idx, delta):
+        i = idx + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def total(self):
+        result = 0
+        i = self.size
+        while i > 0:
+            result += self.tree[i]
+            i -= i & -i
+        return result
+
+    def find(self, target):
+        """Devuelve el primer índice cuya suma acumulada supera `target`."""
+        pos = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= self.size and self.tree[nxt] <= target:
+                pos = nxt
+                target -= self.tree[nxt]
+            step >>= 1
+        return min(pos, self.size - 1)
+
+class WeightedDueSampler:
+    """Muestreo de tarjetas pendientes con peso según retraso y fallos.
+
+    El peso es (1 + fallos) * 2^(días de retraso / HALF_LIFE_DAYS). Como el
+    factor temporal es exponencial, el paso del tiempo multiplica todos los
+    pesos por igual y no hace falta recalcularlos: basta con medir el retraso
+    respecto a un instante de referencia fijo. Las tarjetas que aún no vencen
+    pesan 0 y esperan en un montículo ordenado por fecha. Los pesos se
+    guardan como enteros escalados por SCALE (ver FenwickTree).
+    """
+    SCALE = 1 << 20
+    HALF_LIFE_DAYS = 7
+    MAX_OVERDUE_DAYS = 56  # Los retrasos mayores cuentan como este
+    REBASE_DAYS = 7  # Cada cuánto se recalcula todo con una referencia nueva
+
+    def __init__(self, cards, now=None):
+        self.cards = cards
+        self.positions = {card.id: i for i, card in enumerate(cards)}
+        self.rebuild(now or datetime.now().timestamp())
+
+    def rebuild(self, now):
+        self.reference = now
+        self.pending = []  # (due, card_id) de tarjetas que aún no vencen
+        self.weights = [self.weight(card, now) for card in self.cards]
+        for card, weight in zip(self.cards, self.weights):
+            if weight == 0:
+                self.pending.append((card.due_date.timestamp(), card.id))
+        heapq.heapify(self.pending)
+        self.tree = FenwickTree(self.weights)
+
+    def weight(self, card, now):
+        due = card.due_date.timestamp()
+        if due >= now:
+            return 0
+        overdue_days = min((self.reference - due) / 86400, self.MAX_OVERDUE_DAYS)
+        # Toda tarjeta vencida pesa al menos 1, aunque venciera antes de la referencia
+        return max(1, round((1 + card.fail_count) * 2 ** (overdue_days / self.HALF_LIFE_DAYS) * self.SCALE))
+
+    def set_weight(self, idx, weight):
+        self.tree.add(idx, weight - self.weights[idx])
+        self.weights[idx] = weight
+
+    def refresh(self, now):
+        # Activa las tarjetas que han vencido desde la última vez
+        if now - self.reference > self.REBASE_DAYS * 86400:
+            self.rebuild(now)
+            return
+        while self.pending and self.pending[0][0] < now:
+            due, card_id = heapq.heappop(self.pending)
+            idx = self.positions[card_id]
+            card = self.cards[idx]
+            # Entradas obsoletas: la tarjeta se reprogramó después de encolarse
+            if card.due_date.timestamp() == due and self.weights[idx] == 0:
+                self.set_weight(idx, self.weight(card, now))
+
+    def update(self, card, now=None):
+        """Recalcula el peso de una tarjeta tras responderla o reprogramarla."""
+        now = now or datetime.now().timestamp()
+        idx = self.positions.get(card.id)
+        if idx is None:
+            return
+        weight = self.weight(card, now)
+        self.set_weight(idx, weight)
+        if weight == 0:
+            heapq.heappush(self.pending, (card.due_date.timestamp(), card.id))
+
+    def pick(self, now=None, rng=random):
+        now = now or datetime.now().timestamp()
+        self.refresh(now)
+        for attempt in range(3):
+            total = self.tree.total()
+            if total <= 0:
+                return None
+            idx = self.tree.find(rng.randrange(total))
+            card = self.cards[idx]
+            if self.weights[idx] > 0 and card.due_date.timestamp() < now:
+                return card
+            # La tarjeta se reprogramó y su peso aún no se ha actualizado (un
+            # repaso en curso en otro hilo): se corrige solo su peso y se reintenta
+            self.update(card, now)
+        return None
+
+class SpacedRepetitionSystem:
+    """Sistema SRS seguro para varios hilos.
+
+    Todas las escrituras se serializan con `self.lock`. Las lecturas no toman
+    el bloqueo: las listas e índices nunca se modifican en sitio al recargar,
+    sino que se construyen aparte y se sustituyen de una vez. El muestreador
+    tiene su propio bloqueo, que solo se retiene durante operaciones en
+    memoria, para que elegir tarjeta no espere a las escrituras en disco.
+    """
+    STRATEGIES = ("weighted", "uniform")
+
+    def __init__(self, filename, progress_file=PROGRESS_PATH, confusions_file=CONFUSIONS_PATH,
+                 strategy="weighted", rollups_file=ROLLUPS_PATH, legacy_progress_file=LEGACY_PROGRESS_PATH):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Estrategia de selección desconocida: {strategy}")
+        self.strategy = strategy
+        self.sampler = None
+        self.rollups = RollupStore(rollups_file)
+        self.category_counts = Counter()
+        self.lock = threading.RLock()
+        self.sampler_lock = threading.Lock()  # Siempre después de self.lock, nunca al revés
+        self.reload_lock = threading.Lock()  # Solo un hilo reconstruye el mazo a la vez
+        self.cards = []
+        self.cards_by_id = {}
+        self.search_index = TrigramIndex()
+        self.confusable_index = ConfusableIndex()
+        self.confusions = {}  # (card_id, card_id confundida) -> veces
+        self.confusions_file = confusions_file
+        self.data_file = filename
+        self.data_mtime = None
+        self.progress_file = progress_file
+        self.progress_store = ProgressStore(self.progress_file)
+        self.sync_version = 0
+        self.changes = []  # (versión, card_id) en orden creciente de versión
+        # Migra el progress.json antiguo al formato binario la primera vez
+        if not os.path.exists(self.progress_file) and legacy_progress_file and os.path.exists(legacy_progress_file):
+            migrate_json_progress(legacy_progress_file, self.progress_store)
+        self.load_data(filename)
+        self.load_confusions()
+    
+    def load_data(self, filename):
+        # pandas solo hace falta para leer el Excel: se importa aquí para que
+        # importar el motor siga siendo barato
+        import pandas as pd
+
+        data_mtime = os.path.getmtime(filename)
+        df = pd.read_excel(filename, sheet_name='Sheet1')
+        # Convertir NaN a strings vacíos y asegurar tipo string
+        df['Article'] = df['Article'].fillna('').astype(str)
+        
+        cards = []
+        for idx, (_, row) in enumerate(df.iterrows()):
+            if pd.notna(row['Norwegian']) and pd.notna(row['English']):
+                card = VocabularyCard({
+                    'Article': row['Article'].strip(),
+                    'Norwegian': row['Norwegian'],
+                    'English': row['English']
+                })
+                card.id = idx  # Asignar un ID único
+                cards.append(card)
+        cards_by_id = {card.id: card for card in cards}
+        search_index = TrigramIndex(cards)
+        confusable_index = ConfusableIndex(cards)
+
+        with self.lock:
+            changes = self.load_progress(cards_by_id)
+            sampler = WeightedDueSampler(cards) if self.strategy == "weighted" else None
+            # Se publica todo junto: los lectores ven el mazo anterior o el nuevo
+            self.sampler = sampler
+            self.category_counts = Counter(card_category(card) for card in cards)
+            self.cards_by_id = cards_by_id
+            self.search_index = search_index
+            self.confusable_index = confusable_index
+            self.changes = changes
+            self.sync_version = changes[-1][0] if changes else 0
+            self.cards = cards
+            self.data_mtime = data_mtime
+
+    def after_fork(self):
+        """Prepara el estado propio de un worker creado con fork (modo preload).
+
+        Del master solo se aprovechan las tarjetas y los índices construidos a
+        partir del Excel. El estado mutable es el del arranque del master y un
+        worker anterior (reiniciado por max_requests, timeout o un fallo) pudo
+        cambiarlo en disco, así que se vuelve a leer de los ficheros.
+        """
+        self.lock = threading.RLock()
+        self.sampler_lock = threading.Lock()
+        self.reload_lock = threading.Lock()
+        with self.lock:
+            # Abre un descriptor propio y aplica el progreso guardado
+            changes = self.load_progress(self.cards_by_id)
+            self.changes = changes
+            self.sync_version = changes[-1][0] if changes else 0
+            self.category_counts = Counter(card_category(card) for card in self.cards)
+            if self.strategy == "weighted":
+                self.sampler = WeightedDueSampler(self.cards)
+            self.rollups.load()
+            self.confusions = {}
+            self.load_confusions()
+
+    def reload_if_changed(self):
+        """Recarga el Excel (y reconstruye el índice) si ha cambiado en disco."""
+        if os.path.getmtime(self.data_file) == self.data_mtime:
+            return False
+        # Si otro hilo ya está recargando, este sigue sirviendo el mazo actual
+        # en lugar de leer el Excel por su cuenta
+        if not self.reload_lock.acquire(blocking=False):
+            return False
+        try:
+            # La recarga puede haber terminado entre la comprobación y el bloqueo
+            if os.path.getmtime(self.data_file) == self.data_mtime:
+                return False
+            self.load_data(self.data_file)
+            return True
+        finally:
+            self.reload_lock.release()
+    
+    def load_progress(self, cards_by_id):
+        """Aplica el progreso guardado y devuelve la lista de cambios (versión, card_id)."""
+        self.progress_store.open()
+        missing = self.progress_store.load_into(cards_by_id)
+        # Las tarjetas nuevas del Excel se añaden al final del fichero
+        self.progress_store.append(missing)
+        return sorted((card.version, card.id) for card in cards_by_id.values() if card.version > 0)
+    
+    def save_progress(self):
+        with self.lock:
+            self.progress_store.write_all(self.cards)
+
+    def save_card(self, card):
+        # Asigna una nueva versión de sincronización y reescribe solo su registro
+        with self.lock:
+            self.sync_version += 1
+            card.version = self.sync_version
+            self.changes.append((card.version, card.id))
+            self.progress_store.write_card(card)
+            if self.sampler is not None:
+                with self.sampler_lock:
+                    self.sampler.update(card)
+
+    def review(self, card, user_answer, reviewed_at=None):
+        """Evalúa, actualiza y guarda una respuesta como una única operación atómica."""
+        with self.lock:
+            # Si hubo una recarga, se trabaja sobre la tarjeta vigente y no sobre la antigua
+            card = self.cards_by_id.get(card.id, card)
+            quality, category, message = self.grade(card, user_answer)
+            old_category = card_category(card)
+            card.update(quality, reviewed_at=reviewed_at)
+            self.save_card(card)
+            # Agregados del día: revisiones y categorías actualizadas de forma incremental
+            self.category_counts[old_category] -= 1
+            self.category_counts[card_category(card)] += 1
+            self.rollups.record(date.fromtimestamp(card.reviewed_at), quality, self.category_counts)
+        return quality, category, message
+
+    def select_cards(self, selector):
+        """Devuelve las tarjetas que cumplen todos los criterios del selector.
+
+        Criterios: `ids`, `due_after`/`due_before` (ISO o "now"), `overdue`,
+        `category` (mastered, learning, new) y `min_fails`. Un selector sin
+        criterios no selecciona nada: para todo el mazo hay que pasar `all`.
+        """
+        if not isinstance(selector, dict):
+            raise ValueError("El selector debe ser un objeto")
+        try:
+            return self._select_cards(selector)
+        except (TypeError, OverflowError) as e:
+            # Valores de tipo incorrecto (ids: [null], min_fails: []...) o fuera de rango
+            raise ValueError(f"Selector inválido: {e}") from e
+
+    def _select_cards(self, selector):
+        unknown = set(selector) - {"all", "ids", "due_after", "due_before", "overdue", "category", "min_fails"}
+        if unknown:
+            raise ValueError(f"Criterios desconocidos: {', '.join(sorted(unknown))}")
+        # overdue=false no filtra nada, así que no cuenta como criterio
+        filters = set(selector) - {"all"} - ({"overdue"} if not selector.get("overdue") else set())
+        if not selector.get("all") and not filters:
+            raise ValueError("Selector vacío: indica algún criterio o all=true para todo el mazo")
+        import numpy as np
+
+        ids = np.array([card.id for card in self.cards])
+        due = np.array([card.due_date.timestamp() for card in self.cards])
+        reps = np.array([card.reps for card in self.cards])
+        ease = np.array([card.ease for card in self.cards])
+        fails = np.array([card.fail_count for card in self.cards])
+
+        mask = np.ones(len(self.cards), dtype=bool)
+        if "ids" in selector:
+            mask &= np.isin(ids, [int(card_id) for card_id in selector["ids"]])
+        if "due_after" in selector:
+            mask &= due >= parse_when(selector["due_after"]).timestamp()
+        if "due_before" in selector:
+            mask &= due < parse_when(selector["due_before"]).timestamp()
+        if selector.get("overdue"):
+            mask &= due < datetime.now().timestamp()
+        if "category" in selector:
+            categories = {
+                "mastered": (reps >= 5) & (ease >= 2.5),
+                "learning": (reps > 0) & (reps < 5),
+                "new": reps == 0
+            }
+            if selector["category"] not in categories:
+                raise ValueError(f"Categoría desconocida: {selector['category']}")
+            mask &= categories[selector["category"]]
+        if "min_fails" in selector:
+            mask &= fails >= int(selector["min_fails"])
+        return [self.cards[i] for i in np.flatnonzero(mask)]
+
+    def bulk_update(self, selector, action, dry_run=False):
+        """Aplica una acción a todas las tarjetas seleccionadas como una sola transacción.
+
+        Acciones: `reschedule` (nueva fecha `due`), `postpone` (`days` más
+        tarde) y `reset` (los campos de `fields`, o toda la planificación).
+        Devuelve las tarjetas afectadas.
+        """
+        with self.lock:
+            return self._bulk_update(selector, action, dry_run)
+
+    def _bulk_update(self, selector, action, dry_run):
+        cards = self.select_cards(selector)
+        if not isinstance(action, dict):
+            raise ValueError("La acción debe ser un objeto")
+        try:
+            changes = self._bulk_changes(cards, action)
+        except (TypeError, OverflowError) as e:
+            # days: null, fechas fuera de rango tras aplazar, fields que no son lista...
+            raise ValueError(f"Acción inválida: {e}") from e
+
+        if dry_run or not cards:
+            return cards
+        # Todas las tarjetas comparten una única versión de sincronización
+        self.sync_version += 1
+        for i, card in enumerate(cards):
+            for field, values in changes.items():
+                setattr(card, field, values[i])
+            card.version = self.sync_version
+            self.changes.append((card.version, card.id))
+        if self.sampler is not None:
+            with self.sampler_lock:
+                for card in cards:
+                    self.sampler.update(card)
+        self.progress_store.write_cards(cards)
+        self.category_counts = Counter(card_category(card) for card in self.cards)
+        # El historial del día refleja las categorías tras la operación
+        self.rollups.record_categories(date.today(), self.category_counts)
+        return cards
+
+    def _bulk_changes(self, cards, action):
+        """Calcula los nuevos valores de cada campo sin modificar todavía las tarjetas."""
+        kind = action.get("type")
+        if kind == "reschedule":
+            due = parse_when(action.get("due", "now"))
+            return {"due_date": [due] * len(cards)}
+        if kind == "postpone":
+            delta = timedelta(days=float(action.get("days", 1)))
+            return {"due_date": [card.due_date + delta for card in cards]}
+        if kind == "reset":
+            defaults = {"due_date": datetime.now(), "interval": 1, "ease": 2.5, "reps": 0, "fail_count": 0}
+            fields = action.get("fields") or list(defaults)
+            unknown = set(fields) - set(defaults)
+            if unknown:
+                raise ValueError(f"Campos desconocidos: {', '.join(sorted(map(str, unknown)))}")
+            return {field: [defaults[field]] * len(cards) for field in fields}
+        raise ValueError(f"Acción desconocida: {kind}")
+
+    def get_changes_since(self, version):
+        """Devuelve las tarjetas cuyo estado cambió después de `version`."""
+        if version <= 0:
+            return list(self.cards)
+        start = bisect.bisect_right(self.changes, (version, float("inf")))
+        card_ids = dict.fromkeys(card_id for _, card_id in self.changes[start:])
+        return [self.cards_by_id[card_id] for card_id in card_ids]
+    
+    def load_confusions(self):
+        if os.path.exists(self.confusions_file):
+            with open(self.confusions_file, 'r') as f:
+                for card_id, other_id, count in json.load(f):
+                    self.confusions[(card_id, other_id)] = count
+
+    def record_confusion(self, card_id, other_id):
+        key = (card_id, other_id)
+        with self.lock:
+            self.confusions[key] = self.confusions.get(key, 0) + 1
+            with open(self.confusions_file, 'w') as f:
+                json.dump([[a, b, count] for (a, b), count in self.confusions.items()], f)
+
+    def find_confused_card(self, card, user_answer, fuzzy=True):
+        """Busca otra tarjeta cuya traducción coincide con la respuesta del usuario."""
+        # Coincidencia exacta con otra tarjeta: búsqueda en tiempo constante
+        for other_id in self.confusable_index.lookup(user_answer, exclude=card.id):
+            return self.cards_by_id[other_id]
+        if not fuzzy:
+            return None
+        # Coincidencia aproximada, solo entre las vecinas precalculadas de la tarjeta
+        for other_id in sorted(self.confusable_index.neighbours.get(card.id, {})):
+            other = self.cards_by_id[other_id]
+            for alt in other.english.split(","):
+                if difflib.SequenceMatcher(None, normalize_text(alt), user_answer).ratio() >= 0.8:
+                    return other
+        return None
+
+    def grade(self, card, user_answer, record_confusions=True):
+        """Evalúa una respuesta y devuelve (calidad, categoría, mensaje)."""
+        # Separamos las alternativas correctas (pueden estar separadas por comas)
+        correct_translations = [alt.strip().lower() for alt in card.english.split(",")]
+
+        # Comprobamos si la respuesta coincide exactamente con alguna alternativa
+        if any(user_answer == alt for alt in correct_translations):
+            return 4, "correct", f"¡Correcto! '{card.norwegian}' significa '{card.english}'"
+
+        # Buscamos la mejor coincidencia
+        best_ratio = 0.0
+        best_alt = None
+        for alt in correct_translations:
+            ratio = difflib.SequenceMatcher(None, alt, user_answer).ratio()
+            if ratio > best_ratio:
+                best_ratio = ratio
+                best_alt = alt
+
+        # ¿Ha escrito el significado de otra tarjeta? Si la respuesta es casi
+        # correcta solo se añade la pista: una errata no cuenta como fallo
+        confused_card = self.find_confused_card(card, user_answer, fuzzy=best_ratio < 0.8)
+        if confused_card is not None:
+            if record_confusions:
+                self.record_confusion(card.id, confused_card.id)
+            hint = f"Tu respuesta corresponde a '{confused_card.norwegian}' ('{confused_card.english}')"
+        if best_ratio >= 0.8:
+            diff_str = get_diff(best_alt, user_answer)
+            message = f"Casi correcto. '{card.norwegian}' significa '{card.english}'. Diferencias: {diff_str}"
+            return 3, "incorrect", f"{message}. {hint}" if confused_card is not None else message
+        if confused_card is not None:
+            return 2, "incorrect", f"Incorrecto. '{card.norwegian}' significa '{card.english}'. {hint}"
+        return 2, "incorrect", f"Incorrecto. '{card.norwegian}' significa '{card.english}'. Tu respuesta fue: '{user_answer}'"
+
+    def get_due_cards(self):
+        cards = self.cards
+        print(f"Total cards loaded: {len(cards)}")
+        due_cards = [card for card in cards if datetime.now() > card.due_date]
+        print(f"Due cards: {len(due_cards)}")
+        return due_cards
+    
+    def pick_card(self):
+        """Elige la siguiente tarjeta pendiente según la estrategia configurada."""
+        if self.strategy == "uniform":
+            due_cards = self.get_due_cards()
+            return random.choice(due_cards) if due_cards else None
+        # El muestreador activa tarjetas recién vencidas al elegir: requiere su
+        # bloqueo, pero no el de escritura (no toca el disco)
+        sampler = self.sampler
+        with self.sampler_lock:
+            return sampler.pick()
+
+    def get_card_by_id(self, card_id):
+        return self.cards_by_id.get(card_id)
+
+    def search(self, query, limit=20):
+        results = []
+        cards_by_id = self.cards_by_id
+        for card_id, field, text, score in self.search_index.search(query, limit=limit):
+            # Durante una recarga el índice puede referirse a una tarjeta ya eliminada
+            if card_id in cards_by_id:
+                results.append((cards_by_id[card_id], field, text, score))
+        return results
+
+def parse_when(value):
+    """Convierte "now" o una fecha ISO en datetime."""
+    if value == "now":
+        return datetime.now()
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Fecha inválida: {value}")
+
+# ---------------------------
+# Función para obtener diferencias
+# ---------------------------
+def get_diff(correct, user):
+    """Genera un resumen de las diferencias entre la respuesta correcta y la del usuario."""
+    sm = difflib.SequenceMatcher(None, correct, user)
+    differences = []
+    for tag, i1, i2, j1, j2 in sm.get_opcodes():
+        if tag != 'equal':
+            differences.append(f"{tag}: '{correct[i1:i2]}' vs '{user[j1:j2]}'")
+    return "; ".join(differences)
@@ -0,0 +1,138 @@
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+from srs_engine import EXCEL_PATH, SpacedRepetitionSystem
+
+# ---------------------------
+# Prueba de estrés del núcleo SRS con varios hilos
+# ---------------------------
+# Lanza escritores (review), lectores (tarjetas pendientes, búsqueda, sync) y
+# recargas del Excel a la vez, y comprueba que no se pierde ninguna respuesta
+# ni en memoria ni en el fichero de progreso. Después repasa todas las
+# tarjetas vencidas y comprueba que el muestreador no ofrece ninguna antes de
+# tiempo y que termina sin tarjetas pendientes.
+#   python stress_srs.py [hilos] [respuestas por hilo]
+
+
+def check_drain(srs):
+    """Vence todas las tarjetas con retrasos distintos y las repasa hasta vaciar la cola."""
+    now = datetime.now()
+    card_ids = [card.id for card in srs.cards]
+    for k in range(8):
+        due = (now - timedelta(days=7 * k + 1)).isoformat()
+        srs.bulk_update({"ids": card_ids[k::8]}, {"type": "reschedule", "due": due})
+    reviewed = 0
+    while True:
+        card = srs.pick_card()
+        if card is None:
+            break
+        if card.due_date > datetime.now():
+            return f"se eligió la tarjeta {card.id}, que aún no vence, tras {reviewed} repasos"
+        if reviewed >= len(card_ids):
+            return "el muestreador sigue ofreciendo tarjetas ya repasadas"
+        srs.review(card, "wrong")
+        reviewed += 1
+    if reviewed != len(card_ids):
+        return f"la cola se vació tras {reviewed} repasos de {len(card_ids)}"
+    return None
+
+
+def main(writers=8, answers_per_writer=200):
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        progress_file = os.path.join(tmp_dir, "progress.bin")
+        confusions_file = os.path.join(tmp_dir, "confusions.json")
+        rollups_file = os.path.join(tmp_dir, "rollups.bin")
+        srs = SpacedRepetitionSystem(EXCEL_PATH, progress_file=progress_file, confusions_file=confusions_file,
+                                     rollups_file=rollups_file)
+        card_ids = [card.id for card in srs.cards]
+        expected = Counter()
+        expected_lock = threading.Lock()
+        errors = []
+        done = threading.Event()
+
+        def writer(seed):
+            rng = random.Random(seed)
+            try:
+                for _ in range(answers_per_writer):
+                    card = srs.get_card_by_id(rng.choice(card_ids))
+                    answer = card.english if rng.random() < 0.5 else "wrong"
+                    srs.review(card, answer.strip().lower())
+                    with expected_lock:
+                        expected[card.id] += 1
+            except Exception as e:
+                errors.append(e)
+
+        def reader():
+            try:
+                while not done.is_set():
+                    now = datetime.now()
+                    [card for card in srs.cards if now > card.due_date]
+                    srs.search("hus")
+                    srs.get_changes_since(srs.sync_version // 2)
+                    sum(card.reps for card in srs.cards)
+            except Exception as e:
+                errors.append(e)
+
+        def reloader():
+            try:
+                while not done.is_set():
+                    # Fuerza una recarga completa como si el Excel hubiera cambiado
+                    srs.data_mtime = None
+                    srs.reload_if_changed()
+            except Exception as e:
+                errors.append(e)
+
+        background = [threading.Thread(target=reader) for _ in range(4)]
+        background.append(threading.Thread(target=reloader))
+        workers = [threading.Thread(target=writer, args=(seed,)) for seed in range(writers)]
+        for thread in background + workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        done.set()
+        for thread in background:
+            thread.join()
+
+        total = writers * answers_per_writer
+        if errors:
+            print(f"ERROR: {len(errors)} excepciones, la primera: {errors[0]!r}")
+            return 1
+        if srs.sync_version != total:
+            print(f"ERROR: versión {srs.sync_version}, se esperaban {total} respuestas")
+            return 1
+
+        # El estado en memoria y el del fichero deben coincidir tarjeta a tarjeta
+        reloaded = SpacedRepetitionSystem(EXCEL_PATH, progress_file=progress_file, confusions_file=confusions_file,
+                                          rollups_file=rollups_file)
+        lost = [card.id for card in reloaded.cards
+                if (card.version > 0) != (expected[card.id] > 0)
+                or card.version != srs.cards_by_id[card.id].version]
+        if reloaded.sync_version != total or lost:
+            print(f"ERROR: tarjetas con respuestas perdidas: {lost[:10]}")
+            return 1
+        # Los agregados diarios también deben contar todas las respuestas
+        recorded = sum(row[0] for row in reloaded.rollups.rows.values())
+        if recorded != total:
+            print(f"ERROR: los agregados cuentan {recorded} revisiones de {total}")
+            return 1
+
+        error = check_drain(reloaded)
+        if error:
+            print(f"ERROR: {error}")
+            return 1
+
+        print(f"OK: {total} respuestas de {writers} hilos sin pérdidas")
+        return 0
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    sys.exit(main(*(int(arg) for arg in sys.argv[1:3])))